@@ -464,6 +464,9 @@ class DataFlowKernel(object):
             self.task_state_counts[new_state] += 1
             task_record['status'] = new_state
 
+        # wake up the strategy early once enough tasks have changed state
+        self.flowcontrol.notify(task_record['id'])
+
     @staticmethod
     def _unwrap_remote_exception_wrapper(future: Future) -> Any:
         result = future.result()
@@ -33,6 +33,14 @@ class FlowControl(object):
     of ``interval`` for systems with infrequent events as well as systems which would
     generate large bursts of events.
 
+    Events are reported by the DFK through ``notify`` whenever a task changes
+    state. Crossing the threshold wakes the timer thread, which makes the callback
+    immediately instead of waiting for the interval to expire; the interval is
+    still needed so that provider block states keep being polled while no tasks
+    are changing state. Callbacks triggered by events are made at most once every
+    ``interval / 5`` seconds, so that a high task throughput does not run the
+    callback back to back.
+
     Once a callback is triggered, the callback generally runs a strategy
     method on the sites available as well asqeuque
 
@@ -64,30 +72,43 @@ class FlowControl(object):
         self._event_count = 0
         self._event_buffer = []
         self._wake_up_time = time.time() + 1
+        self._last_callback_time = 0.0
+        self.min_event_interval = interval / 5
         self._kill_event = threading.Event()
+        self._wake_up_event = threading.Event()
         self._thread = threading.Thread(target=self._wake_up_timer, args=(self._kill_event,), name="FlowControl-Thread")
         self._thread.daemon = True
         self._thread.start()
 
     def _wake_up_timer(self, kill_event):
         """Internal. This is the function that the thread will execute.
-        waits on an event so that the thread can make a quick exit when close() is called
+        waits on an event so that the thread can make a quick exit when close() is called,
+        or an early callback when notify() crosses the event threshold
 
         Args:
-            - kill_event (threading.Event) : Event to wait on
+            - kill_event (threading.Event) : Event checked whenever the thread wakes up
         """
 
         while True:
             prev = self._wake_up_time
 
             # Waiting for the event returns True only when the event
-            # is set, usually by the parent thread
-            time_to_die = kill_event.wait(float(max(prev - time.time(), 0)))
+            # is set, either by notify() or by close()
+            woken = self._wake_up_event.wait(float(max(prev - time.time(), 0)))
+            self._wake_up_event.clear()
 
-            if time_to_die:
+            if kill_event.is_set():
                 return
 
-            if prev == self._wake_up_time:
+            if woken:
+                # too soon after the last callback, so sleep until the callback is due;
+                # notify() sets the wake up event only once per callback, so events
+                # arriving in the meantime do not wake this thread again
+                next_event_time = self._last_callback_time + self.min_event_interval
+                if kill_event.wait(max(next_event_time - time.time(), 0)):
+                    return
+                self.make_callback(kind='event')
+            elif prev == self._wake_up_time:
                 self.make_callback(kind='timer')
             else:
                 print("Sleeping a bit more")
@@ -96,9 +117,9 @@ class FlowControl(object):
         """Let the FlowControl system know that there is an event."""
         self._event_buffer.extend([event_id])
         self._event_count += 1
-        if self._event_count >= self.threshold:
-            logger.debug("Eventcount >= threshold")
-            self.make_callback(kind="event")
+        if self._event_count == self.threshold:
+            logger.debug("Eventcount reached threshold")
+            self._wake_up_event.set()
 
     def make_callback(self, kind=None):
         """Makes the callback and resets the timer.
@@ -107,12 +128,14 @@ class FlowControl(object):
                - kind (str): Default=None, used to pass information on what
                  triggered the callback
         """
-        self._wake_up_time = time.time() + self.interval
+        self._last_callback_time = time.time()
+        self._wake_up_time = self._last_callback_time + self.interval
+        event_buffer, self._event_buffer = self._event_buffer, []
+        self._event_count = 0
         try:
-            self.callback(tasks=self._event_buffer, kind=kind)
+            self.callback(tasks=event_buffer, kind=kind)
         except Exception:
             logger.error("Flow control callback threw an exception - logging and proceeding anyway", exc_info=True)
-        self._event_buffer = []
 
     def add_executors(self, executors):
         self.task_status_poller.add_executors(executors)
@@ -120,6 +143,7 @@ class FlowControl(object):
     def close(self):
         """Merge the threads and terminate."""
         self._kill_event.set()
+        self._wake_up_event.set()
         self._thread.join()
 
 
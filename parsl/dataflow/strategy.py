@@ -1,7 +1,9 @@
 import logging
 import time
 import math
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Set, Tuple
 
 from parsl.dataflow.executor_status import ExecutorStatus
 from parsl.executors import HighThroughputExecutor
@@ -9,6 +11,76 @@ from parsl.providers.provider_base import JobState
 
 logger = logging.getLogger(__name__)
 
+# Positions of the block states counted by the strategy in its state histogram
+_RUNNING, _PENDING = 0, 1
+_STATE_TO_IDX = {JobState.RUNNING: _RUNNING, JobState.PENDING: _PENDING}
+
+# Scaling actions returned by _decide
+_NOOP, _SCALE_OUT, _SCALE_IN, _SCALE_IN_IDLE = 0, 1, 2, 3
+
+
+def _decide(active_tasks, active_blocks, min_blocks, max_blocks, parallelism,
+            slots_per_block, htex_scale_in):
+    """Decide how one executor should be scaled.
+
+    This is the arithmetic of Strategy._general_strategy, kept apart from the
+    bookkeeping, logging and provider calls made there.
+
+    Returns (action, n): scale out or in by n blocks, or do nothing. _SCALE_IN_IDLE
+    removes n blocks from an executor without tasks, once it has been idle for
+    max_idletime; _SCALE_IN removes underused blocks of a busy HTEX.
+    """
+    active_slots = active_blocks * slots_per_block
+
+    # Case 1
+    # No tasks.
+    if active_tasks == 0:
+        # Case 1a
+        # Fewer blocks that min_blocks
+        if active_blocks <= min_blocks:
+            return _NOOP, 0
+
+        # Case 1b
+        # More blocks than min_blocks. Scale down
+        return _SCALE_IN_IDLE, active_blocks - min_blocks
+
+    # Case 2
+    # More tasks than the available slots.
+    # active_tasks > 0 here, so this is active_slots / active_tasks < parallelism
+    if active_slots < parallelism * active_tasks:
+        # Case 2a
+        # We have the max blocks possible
+        if active_blocks >= max_blocks:
+            return _NOOP, 0
+
+        # Case 2b
+        excess_slots = math.ceil((active_tasks * parallelism) - active_slots)
+        # ceiling division; int() because workers_per_node may be a float
+        excess_blocks = int(-(-excess_slots // slots_per_block))
+        return _SCALE_OUT, min(excess_blocks, max_blocks - active_blocks)
+
+    if active_slots == 0:
+        # Case 4
+        # Request a single slot
+        if active_blocks < max_blocks:
+            return _SCALE_OUT, 1
+        return _NOOP, 0
+
+    # Case 4
+    # More slots than tasks
+    if active_slots > active_tasks:
+        # Scale down for htex with the htex_auto_scale strategy;
+        # skip for simple strategy and other executors
+        if htex_scale_in and active_blocks > min_blocks:
+            excess_slots = math.ceil(active_slots - (active_tasks * parallelism))
+            excess_blocks = int(-(-excess_slots // slots_per_block))
+            return _SCALE_IN, min(excess_blocks, active_blocks - min_blocks)
+        return _NOOP, 0
+
+    # Case 3
+    # tasks ~ slots
+    return _NOOP, 0
+
 
 class Strategy(object):
     """FlowControl strategy.
@@ -106,6 +178,11 @@ class Strategy(object):
 
     """
 
+    # the strategy_type of each scaling strategy option of Config which is
+    # implemented by _general_strategy; None selects _strategy_noop instead
+    _STRATEGY_TYPES = {'simple': 'simple',
+                       'htex_auto_scale': 'htex'}
+
     def __init__(self, dfk):
         """Initialize strategy."""
         self.dfk = dfk
@@ -113,20 +190,53 @@ class Strategy(object):
         self.executors = {}
         self.max_idletime = self.dfk.config.max_idletime
 
+        # (active_tasks, running, pending) seen by the last pass over each executor
+        # which made no scaling decision; an unchanged fingerprint is skipped.
+        self._last_fingerprint: Dict[str, Tuple[int, int, int]] = {}
+
+        # labels of the executors which had scaling enabled when they were added
+        self._scaling_labels: Set[str] = set()
+
         for e in self.dfk.config.executors:
             self.executors[e.label] = {'idle_since': None, 'config': e.label}
 
-        self.strategies = {None: self._strategy_noop,
-                           'simple': self._strategy_simple,
-                           'htex_auto_scale': self._strategy_htex_auto_scale}
-
-        self.strategize = self.strategies[self.config.strategy]
+        if self.config.strategy is None:
+            self.strategy_type = None
+            self.strategize = self._strategy_noop
+        else:
+            self.strategy_type = self._STRATEGY_TYPES[self.config.strategy]
+            self.strategize = self._general_strategy
 
-        logger.debug("Scaling strategy: {0}".format(self.config.strategy))
+        logger.debug("Scaling strategy: %s", self.config.strategy)
 
     def add_executors(self, executors):
         for executor in executors:
-            self.executors[executor.label] = {'idle_since': None, 'config': executor.label}
+            executor_state = {'idle_since': None, 'config': executor.label}
+
+            # only executors which the TaskStatusPoller polls are ever passed to
+            # strategize; the others, such as the FluxExecutor, need not have
+            # the provider attributes read below
+            if executor.status_polling_interval > 0 and executor.scaling_enabled:
+                self._scaling_labels.add(executor.label)
+
+                # These are fixed by the configuration, so they are looked up
+                # once here rather than on every strategy pass.
+                # FIXME we need to handle case where provider does not define these
+                # FIXME probably more of this logic should be moved to the provider
+                tasks_per_node = executor.workers_per_node
+                nodes_per_block = executor.provider.nodes_per_block
+                # what the strategy type changes is resolved here for each
+                # executor, so _general_strategy does not check it every pass
+                htex_scale_in = self.strategy_type == 'htex' and isinstance(executor, HighThroughputExecutor)
+                executor_state.update(htex_scale_in=htex_scale_in,
+                                      min_blocks=executor.provider.min_blocks,
+                                      max_blocks=executor.provider.max_blocks,
+                                      parallelism=executor.provider.parallelism,
+                                      tasks_per_node=tasks_per_node,
+                                      nodes_per_block=nodes_per_block,
+                                      slots_per_block=tasks_per_node * nodes_per_block)
+
+            self.executors[executor.label] = executor_state
 
     def _strategy_noop(self, status: List[ExecutorStatus], tasks):
         """Do nothing.
@@ -135,144 +245,126 @@ class Strategy(object):
             - tasks (task_ids): Not used here.
         """
 
-    def _strategy_simple(self, status_list, tasks):
-        self._general_strategy(status_list, tasks, strategy_type='simple')
+    def _general_strategy(self, status_list, tasks):
+        """Scaling strategy shared by the 'simple' and 'htex_auto_scale' options.
 
-    def _strategy_htex_auto_scale(self, status_list, tasks):
-        """HTEX specific auto scaling strategy
+        Both scale out by requesting additional compute resources via the
+        provider when the workload requirements exceed the provisioned
+        capacity, and scale in executors which have been idle for max_idletime.
 
-        This strategy works only for HTEX. This strategy will scale up by
-        requesting additional compute resources via the provider when the
-        workload requirements exceed the provisioned capacity. The scale out
-        behavior is exactly like the 'simple' strategy.
-
-        If there are idle blocks during execution, this strategy will terminate
-        those idle blocks specifically. When # of tasks >> # of blocks, HTEX places
-        tasks evenly across blocks, which makes it rather difficult to ensure that
-        some blocks will reach 0% utilization. Consequently, this strategy can be
-        expected to scale down effectively only when # of workers, or tasks executing
-        per block is close to 1.
+        With 'htex_auto_scale', idle blocks are additionally terminated
+        during execution. This works only for HTEX. When # of tasks >> # of
+        blocks, HTEX places tasks evenly across blocks, which makes it rather
+        difficult to ensure that some blocks will reach 0% utilization.
+        Consequently, this strategy can be expected to scale down effectively
+        only when # of workers, or tasks executing per block is close to 1.
 
         Args:
             - tasks (task_ids): Not used here.
         """
-        self._general_strategy(status_list, tasks, strategy_type='htex')
+        status_list = [s for s in status_list if s.executor.label in self._scaling_labels]
+        if not status_list:
+            return
+
+        # scaling requests are collected here and made together once every
+        # executor has been looked at, see _run_scaling_actions
+        scaling_actions: List[Tuple[str, partial]] = []
 
-    def _general_strategy(self, status_list, tasks, *, strategy_type):
         for exec_status in status_list:
             executor = exec_status.executor
             label = executor.label
-            if not executor.scaling_enabled:
-                continue
 
             # Tasks that are either pending completion
             active_tasks = executor.outstanding
 
             status = exec_status.status
 
-            # FIXME we need to handle case where provider does not define these
-            # FIXME probably more of this logic should be moved to the provider
-            min_blocks = executor.provider.min_blocks
-            max_blocks = executor.provider.max_blocks
-            tasks_per_node = executor.workers_per_node
-
-            nodes_per_block = executor.provider.nodes_per_block
-            parallelism = executor.provider.parallelism
+            executor_state = self.executors[label]
+            min_blocks = executor_state['min_blocks']
+            max_blocks = executor_state['max_blocks']
+            parallelism = executor_state['parallelism']
+            slots_per_block = executor_state['slots_per_block']
+
+            # status also holds blocks in other states, such as blocks which the
+            # provider still reports as COMPLETED or blocks that failed to submit,
+            # so pending cannot be derived from len(status) - running
+            state_counts = [0, 0]
+            for job_status in status.values():
+                i = _STATE_TO_IDX.get(job_status.state)
+                if i is not None:
+                    state_counts[i] += 1
+            running = state_counts[_RUNNING]
+            pending = state_counts[_PENDING]
+
+            fingerprint = (active_tasks, running, pending)
+            if self._last_fingerprint.get(label) == fingerprint:
+                # Nothing changed since a pass which left this executor alone
+                continue
+            self._last_fingerprint.pop(label, None)
 
-            running = sum([1 for x in status.values() if x.state == JobState.RUNNING])
-            pending = sum([1 for x in status.values() if x.state == JobState.PENDING])
             active_blocks = running + pending
-            active_slots = active_blocks * tasks_per_node * nodes_per_block
 
-            if hasattr(executor, 'connected_workers'):
-                logger.debug('Executor {} has {} active tasks, {}/{} running/pending blocks, and {} connected workers'.format(
-                    label, active_tasks, running, pending, executor.connected_workers))
-            else:
-                logger.debug('Executor {} has {} active tasks and {}/{} running/pending blocks'.format(
-                    label, active_tasks, running, pending))
+            # the description can be expensive to build, for example HTEX asks its
+            # interchange for the connected workers, so only do it when it is logged
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s", executor.status_description(active_tasks, running, pending))
 
             # reset kill timer if executor has active tasks
-            if active_tasks > 0 and self.executors[executor.label]['idle_since']:
-                self.executors[executor.label]['idle_since'] = None
-
-            # Case 1
-            # No tasks.
-            if active_tasks == 0:
-                # Case 1a
-                # Fewer blocks that min_blocks
-                if active_blocks <= min_blocks:
-                    # Ignore
-                    # logger.debug("Strategy: Case.1a")
-                    pass
-
-                # Case 1b
-                # More blocks than min_blocks. Scale down
-                else:
-                    # We want to make sure that max_idletime is reached
-                    # before killing off resources
-                    if not self.executors[executor.label]['idle_since']:
-                        logger.debug("Executor {} has 0 active tasks; starting kill timer (if idle time exceeds {}s, resources will be removed)".format(
-                            label, self.max_idletime)
-                        )
-                        self.executors[executor.label]['idle_since'] = time.time()
-
-                    idle_since = self.executors[executor.label]['idle_since']
-                    if (time.time() - idle_since) > self.max_idletime:
-                        # We have resources idle for the max duration,
-                        # we have to scale_in now.
-                        logger.debug("Idle time has reached {}s for executor {}; removing resources".format(
-                            self.max_idletime, label)
-                        )
-                        exec_status.scale_in(active_blocks - min_blocks)
-
-                    else:
-                        pass
-                        # logger.debug("Strategy: Case.1b. Waiting for timer : {0}".format(idle_since))
-
-            # Case 2
-            # More tasks than the available slots.
-            elif (float(active_slots) / active_tasks) < parallelism:
-                # Case 2a
-                # We have the max blocks possible
-                if active_blocks >= max_blocks:
-                    # Ignore since we already have the max nodes
-                    # logger.debug("Strategy: Case.2a")
-                    pass
-
-                # Case 2b
-                else:
-                    # logger.debug("Strategy: Case.2b")
-                    excess_slots = math.ceil((active_tasks * parallelism) - active_slots)
-                    excess_blocks = math.ceil(float(excess_slots) / (tasks_per_node * nodes_per_block))
-                    excess_blocks = min(excess_blocks, max_blocks - active_blocks)
-                    logger.debug("Requesting {} more blocks".format(excess_blocks))
-                    exec_status.scale_out(excess_blocks)
-
-            elif active_slots == 0 and active_tasks > 0:
-                # Case 4
-                logger.debug("Requesting single slot")
-                if active_blocks < max_blocks:
-                    exec_status.scale_out(1)
-
-            # Case 4
-            # More slots than tasks
-            elif active_slots > 0 and active_slots > active_tasks:
-                if strategy_type == 'htex':
-                    # Scale down for htex
-                    logger.debug("More slots than tasks")
-                    if isinstance(executor, HighThroughputExecutor):
-                        if active_blocks > min_blocks:
-                            excess_slots = math.ceil(active_slots - (active_tasks * parallelism))
-                            excess_blocks = math.ceil(float(excess_slots) / (tasks_per_node * nodes_per_block))
-                            excess_blocks = min(excess_blocks, active_blocks - min_blocks)
-                            exec_status.scale_in(excess_blocks, force=False, max_idletime=self.max_idletime)
-
-                elif strategy_type == 'simple':
-                    # skip for simple strategy
-                    pass
-
-            # Case 3
-            # tasks ~ slots
+            if active_tasks > 0 and executor_state['idle_since']:
+                executor_state['idle_since'] = None
+
+            action, n = _decide(active_tasks, active_blocks, min_blocks, max_blocks,
+                                parallelism, slots_per_block, executor_state['htex_scale_in'])
+
+            if action == _SCALE_OUT:
+                logger.debug("Requesting %s more blocks for executor %s", n, label)
+                scaling_actions.append((label, partial(exec_status.scale_out, n)))
+
+            elif action == _SCALE_IN:
+                logger.debug("More slots than tasks for executor %s; removing %s blocks", label, n)
+                scaling_actions.append((label, partial(exec_status.scale_in, n,
+                                                       force=False, max_idletime=self.max_idletime)))
+
+            elif action == _SCALE_IN_IDLE:
+                # We want to make sure that max_idletime is reached
+                # before killing off resources
+                if not executor_state['idle_since']:
+                    logger.debug("Executor %s has 0 active tasks; starting kill timer (if idle time exceeds %ss, resources will be removed)",
+                                 label, self.max_idletime)
+                    executor_state['idle_since'] = time.time()
+
+                idle_since = executor_state['idle_since']
+                if (time.time() - idle_since) > self.max_idletime:
+                    # We have resources idle for the max duration,
+                    # we have to scale_in now.
+                    logger.debug("Idle time has reached %ss for executor %s; removing resources",
+                                 self.max_idletime, label)
+                    scaling_actions.append((label, partial(exec_status.scale_in, n)))
+
             else:
-                # logger.debug("Strategy: Case 3")
-                pass
+                self._last_fingerprint[label] = fingerprint
+
+        self._run_scaling_actions(scaling_actions)
+
+    def _run_scaling_actions(self, actions):
+        """Make the scale_in/scale_out calls decided on by one strategy pass.
+
+        Each call usually goes out to a batch system or cloud API, so when several
+        executors need scaling at the same time the calls are made concurrently
+        rather than one after another. A failure to scale one executor is logged
+        and does not prevent the others from being scaled.
+        """
+        if len(actions) == 1:
+            self._run_scaling_action(*actions[0])
+        elif actions:
+            with ThreadPoolExecutor(max_workers=len(actions), thread_name_prefix="Strategy-Scaling") as pool:
+                for label, action in actions:
+                    pool.submit(self._run_scaling_action, label, action)
+
+    @staticmethod
+    def _run_scaling_action(label, action):
+        try:
+            action()
+        except Exception:
+            # the partial itself is not logged, as its repr includes the status of every block
+            logger.exception("Failed to %s %s blocks of executor %s", action.func.__name__, action.args[0], label)
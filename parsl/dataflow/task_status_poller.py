@@ -109,8 +109,10 @@ class TaskStatusPoller(object):
             item.poll(now)
 
     def add_executors(self, executors: Sequence[ParslExecutor]):
+        # the strategy must know about the executors before the flow control
+        # thread can find them in the poll items and pass them to strategize
+        self._strategy.add_executors(executors)
         for executor in executors:
             if executor.status_polling_interval > 0:
                 logger.debug("Adding executor {}".format(executor.label))
                 self._poll_items.append(PollItem(executor, self.dfk))
-        self._strategy.add_executors(executors)
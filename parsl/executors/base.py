@@ -111,6 +111,18 @@ class ParslExecutor(metaclass=ABCMeta):
         """
         return []
 
+    def status_description(self, active_tasks: int, running: int, pending: int) -> str:
+        """Describe the current scaling state of this executor, for logging by the
+        scaling strategy.
+
+        :param active_tasks: the number of tasks outstanding on this executor
+        :param running: the number of running blocks
+        :param pending: the number of pending blocks
+        :return: a human readable summary
+        """
+        return "Executor {} has {} active tasks and {}/{} running/pending blocks".format(
+            self.label, active_tasks, running, pending)
+
     def monitor_resources(self) -> bool:
         """Should resource monitoring happen for tasks on running on this executor?
 
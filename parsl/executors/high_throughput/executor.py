@@ -500,6 +500,10 @@ class HighThroughputExecutor(BlockProviderExecutor, RepresentationMixin):
         workers = self.command_client.run("WORKERS")
         return workers
 
+    def status_description(self, active_tasks: int, running: int, pending: int) -> str:
+        return "Executor {} has {} active tasks, {}/{} running/pending blocks, and {} connected workers".format(
+            self.label, active_tasks, running, pending, self.connected_workers)
+
     @property
     def connected_managers(self):
         workers = self.command_client.run("MANAGERS")
@@ -1,6 +1,12 @@
-from flask import render_template
+import collections
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import make_response, render_template
 from flask import current_app as app
 import pandas as pd
+from sqlalchemy import case, text
 from parsl.monitoring.visualization.models import Workflow, Task, Status, db
 
 from parsl.monitoring.visualization.plots.default.workflow_plots import task_gantt_plot, task_per_app_plot, workflow_dag_plot
@@ -9,6 +15,10 @@ from parsl.monitoring.visualization.plots.default.workflow_resource_plots import
 
 dummy = True
 
+# the independent queries made for a single page are run concurrently on this
+# pool, so that the page waits for the slowest query rather than for all of them
+query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="parsl-visualize-query")
+
 import datetime
 
 
@@ -34,17 +44,72 @@ def format_duration(value):
         return "-"
 
 
+def read_sql_query_float32(query, params, float32_columns, chunksize=50000):
+    """Read a potentially large query in chunks, storing the given columns as
+    float32 so that only one chunk at a time is ever held as float64.
+    """
+    chunks = [chunk.astype({column: 'float32' for column in float32_columns})
+              for chunk in pd.read_sql_query(query, db.engine, params=params, chunksize=chunksize)]
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def completed_workflow_cache(func, maxsize=16):
+    """Memoize func(workflow_id, time_completed, ...) for completed workflows.
+
+    The monitoring records of a workflow do not change once it has completed,
+    so plots generated from them can be reused. Calls for workflows that are
+    still running (time_completed is None) always go to func, and so do calls
+    which returned None, as records may still arrive after time_completed has
+    been written. Each entry holds several rendered plots, so only the maxsize
+    most recently used entries are kept.
+    """
+    cache = collections.OrderedDict()  # type: collections.OrderedDict
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(workflow_id, time_completed, *args):
+        if time_completed is None:
+            return func(workflow_id, time_completed, *args)
+
+        key = (workflow_id, time_completed) + args
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+        result = func(workflow_id, time_completed, *args)
+        if result is not None:
+            with lock:
+                cache[key] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+        return result
+    return wrapper
+
+
+def completed_workflow_response(page, workflow_details):
+    """Allow browsers to cache a page about a completed workflow, which like
+    the plots in completed_workflow_cache will not change any more.
+    """
+    response = make_response(page)
+    if workflow_details.time_completed is not None:
+        response.cache_control.max_age = 3600
+    return response
+
+
 app.jinja_env.filters['timeformat'] = format_time
 app.jinja_env.filters['durationformat'] = format_duration
 
 
 @app.route('/')
 def index():
-    workflows = Workflow.query.all()
-    for workflow in workflows:
-        workflow.status = 'Running'
-        if workflow.time_completed is not None:
-            workflow.status = 'Completed'
+    status = case([(Workflow.time_completed.is_(None), 'Running')], else_='Completed')
+    workflows = db.session.query(Workflow.run_id, Workflow.workflow_name, Workflow.workflow_version,
+                                 Workflow.user, Workflow.time_began, Workflow.time_completed,
+                                 Workflow.tasks_completed_count, Workflow.tasks_failed_count,
+                                 status.label('status')).all()
     return render_template('workflows_summary.html', workflows=workflows)
 
 
@@ -55,23 +120,43 @@ def workflow(workflow_id):
     if workflow_details is None:
         return render_template('error.html', message="Workflow %s could not be found" % workflow_id)
 
-    df_status = pd.read_sql_query(
-        "SELECT run_id, task_id, task_status_name, timestamp FROM status WHERE run_id='%s'" % workflow_id, db.engine)
-    df_task = pd.read_sql_query("""SELECT task_id, task_func_name,
-                                task_time_returned from task
-                                WHERE run_id='%s'"""
-                                % (workflow_id), db.engine)
-    df_task_tries = pd.read_sql_query("""SELECT task.task_id, task_func_name,
-                                      task_try_time_running, task_try_time_returned from task, try
-                                      WHERE task.task_id = try.task_id AND task.run_id='%s' and try.run_id='%s'"""
-                                      % (workflow_id, workflow_id), db.engine)
-    task_summary = db.engine.execute(
-        "SELECT task_func_name, count(*) as 'frequency' from task WHERE run_id='%s' group by task_func_name;" % workflow_id)
-    return render_template('workflow.html',
-                           workflow_details=workflow_details,
-                           task_summary=task_summary,
-                           task_gantt=task_gantt_plot(df_task, df_status, time_completed=workflow_details.time_completed),
-                           task_per_app=task_per_app_plot(df_task_tries, df_status))
+    task_summary, task_gantt, task_per_app = workflow_plots(workflow_id, workflow_details.time_completed)
+    return completed_workflow_response(render_template('workflow.html',
+                                                       workflow_details=workflow_details,
+                                                       task_summary=task_summary,
+                                                       task_gantt=task_gantt,
+                                                       task_per_app=task_per_app),
+                                       workflow_details)
+
+
+@completed_workflow_cache
+def workflow_plots(workflow_id, time_completed):
+    df_status_future = query_pool.submit(pd.read_sql_query,
+                                         text("SELECT run_id, task_id, task_status_name, timestamp FROM status WHERE run_id=:run_id"),
+                                         db.engine, params={'run_id': workflow_id})
+    # one row per try, plus one row for each task which has not been tried yet;
+    # the task list, the tries and the per-app summary are all split out of it
+    df_task_and_tries = pd.read_sql_query(text("""SELECT task.task_id, task.task_func_name, task.task_time_returned,
+                                               try.try_id, try.task_try_time_running, try.task_try_time_returned
+                                               FROM task LEFT JOIN try
+                                               ON task.task_id = try.task_id AND task.run_id = try.run_id
+                                               WHERE task.run_id=:run_id"""),
+                                          db.engine, params={'run_id': workflow_id})
+    df_task = df_task_and_tries.drop_duplicates('task_id')[
+        ['task_id', 'task_func_name', 'task_time_returned']].reset_index(drop=True)
+    df_task_tries = df_task_and_tries.loc[df_task_and_tries['try_id'].notna(),
+                                          ['task_id', 'task_func_name', 'task_try_time_running', 'task_try_time_returned']
+                                          ].reset_index(drop=True)
+    task_summary = df_task.groupby('task_func_name').size().reset_index(name='frequency').to_dict('records')
+    df_status = df_status_future.result()
+    return (task_summary,
+            task_gantt_plot(df_task, df_status, time_completed=time_completed),
+            task_per_app_plot(df_task_tries, df_status))
+
+
+# the columns of the task table listed by app.html; the rest of a task row,
+# such as its inputs and outputs, is only needed on the page for that task
+app_task_columns = (Task.task_func_name, Task.task_id, Task.task_depends, Task.task_time_returned)
 
 
 @app.route('/workflow/<workflow_id>/app/<app_name>')
@@ -82,7 +167,7 @@ def parsl_app(workflow_id, app_name):
         return render_template('error.html', message="Workflow %s could not be found" % workflow_id)
 
     task_summary = Task.query.filter_by(
-        run_id=workflow_id, task_func_name=app_name)
+        run_id=workflow_id, task_func_name=app_name).with_entities(*app_task_columns).all()
     return render_template('app.html',
                            app_name=app_name,
                            workflow_details=workflow_details,
@@ -96,7 +181,7 @@ def parsl_apps(workflow_id):
     if workflow_details is None:
         return render_template('error.html', message="Workflow %s could not be found" % workflow_id)
 
-    task_summary = Task.query.filter_by(run_id=workflow_id)
+    task_summary = Task.query.filter_by(run_id=workflow_id).with_entities(*app_task_columns).all()
     return render_template('app.html',
                            app_name="All Apps",
                            workflow_details=workflow_details,
@@ -116,7 +201,8 @@ def task(workflow_id, task_id):
         run_id=workflow_id, task_id=task_id).order_by(Status.timestamp)
 
     df_resources = pd.read_sql_query(
-        "SELECT * FROM resource WHERE run_id='%s' AND task_id='%s'" % (workflow_id, task_id), db.engine)
+        text("SELECT * FROM resource WHERE run_id=:run_id AND task_id=:task_id"),
+        db.engine, params={'run_id': workflow_id, 'task_id': task_id})
 
     return render_template('task.html',
                            workflow_details=workflow_details,
@@ -133,17 +219,17 @@ def task(workflow_id, task_id):
 @app.route('/workflow/<workflow_id>/dag_<path:path>')
 def workflow_dag_details(workflow_id, path='group_by_apps'):
     workflow_details = Workflow.query.filter_by(run_id=workflow_id).first()
-    query = """SELECT task.task_id, task.task_func_name, task.task_depends, status.task_status_name
-               FROM task LEFT JOIN status
-               ON task.task_id = status.task_id
-               AND task.run_id = status.run_id
-               AND status.timestamp = (SELECT MAX(status.timestamp)
-                                       FROM status
-                                       WHERE status.task_id = task.task_id and status.run_id = task.run_id
-                                      )
-               WHERE task.run_id='%s'""" % (workflow_id)
-
-    df_tasks = pd.read_sql_query(query, db.engine)
+    query = text("""SELECT task.task_id, task.task_func_name, task.task_depends, status.task_status_name
+                    FROM task LEFT JOIN status
+                    ON task.task_id = status.task_id
+                    AND task.run_id = status.run_id
+                    AND status.timestamp = (SELECT MAX(status.timestamp)
+                                            FROM status
+                                            WHERE status.task_id = task.task_id and status.run_id = task.run_id
+                                           )
+                    WHERE task.run_id=:run_id""")
+
+    df_tasks = pd.read_sql_query(query, db.engine, params={'run_id': workflow_id})
 
     group_by_apps = (path == "group_by_apps")
     return render_template('dag.html',
@@ -158,31 +244,52 @@ def workflow_resources(workflow_id):
     if workflow_details is None:
         return render_template('error.html', message="Workflow %s could not be found" % workflow_id)
 
-    df_resources = pd.read_sql_query(
-        "SELECT * FROM resource WHERE run_id='%s'" % (workflow_id), db.engine)
-    if df_resources.empty:
+    plots = workflow_resource_plots(workflow_id, workflow_details.time_completed)
+    if plots is None:
         return render_template('error.html',
                                message="Workflow %s does not have any resource usage records." % workflow_id)
 
-    df_task = pd.read_sql_query(
-        "SELECT * FROM task WHERE run_id='%s'" % (workflow_id), db.engine)
-    df_task_tries = pd.read_sql_query("""SELECT task.task_id, task_func_name,
-                                      task_try_time_launched, task_try_time_running, task_try_time_returned from task, try
-                                      WHERE task.task_id = try.task_id AND task.run_id='%s' and try.run_id='%s'"""
-                                      % (workflow_id, workflow_id), db.engine)
-    df_node = pd.read_sql_query(
-        "SELECT * FROM node WHERE run_id='%s'" % (workflow_id), db.engine)
-
-    return render_template('resource_usage.html', workflow_details=workflow_details,
-                           user_time_distribution_avg_plot=resource_distribution_plot(
-                               df_resources, df_task, type='psutil_process_time_user', label='CPU Time Distribution', option='avg'),
-                           user_time_distribution_max_plot=resource_distribution_plot(
-                               df_resources, df_task, type='psutil_process_time_user', label='CPU Time Distribution', option='max'),
-                           memory_usage_distribution_avg_plot=resource_distribution_plot(
-                               df_resources, df_task, type='psutil_process_memory_resident', label='Memory Distribution', option='avg'),
-                           memory_usage_distribution_max_plot=resource_distribution_plot(
-                               df_resources, df_task, type='psutil_process_memory_resident', label='Memory Distribution', option='max'),
-                           cpu_efficiency=resource_efficiency(df_resources, df_node, label='CPU'),
-                           memory_efficiency=resource_efficiency(df_resources, df_node, label='mem'),
-                           worker_efficiency=worker_efficiency(df_task_tries, df_node),
-                           )
+    return completed_workflow_response(render_template('resource_usage.html', workflow_details=workflow_details, **plots),
+                                       workflow_details)
+
+
+@completed_workflow_cache
+def workflow_resource_plots(workflow_id, time_completed):
+    df_task_future = query_pool.submit(pd.read_sql_query,
+                                       text("SELECT task_id FROM task WHERE run_id=:run_id"),
+                                       db.engine, params={'run_id': workflow_id})
+    df_task_tries_future = query_pool.submit(pd.read_sql_query,
+                                             text("""SELECT task.task_id, task_func_name,
+                                                  task_try_time_launched, task_try_time_running, task_try_time_returned from task, try
+                                                  WHERE task.task_id = try.task_id AND task.run_id=:run_id and try.run_id=:run_id"""),
+                                             db.engine, params={'run_id': workflow_id})
+    df_node_future = query_pool.submit(pd.read_sql_query,
+                                       text("SELECT timestamp, cpu_count, total_memory, worker_count FROM node WHERE run_id=:run_id"),
+                                       db.engine, params={'run_id': workflow_id})
+
+    # resource is the largest table, with a row per task per monitoring interval,
+    # so only the columns that the plots below use are loaded
+    df_resources = read_sql_query_float32(
+        text("""SELECT task_id, timestamp, psutil_process_time_user, psutil_process_time_system,
+                psutil_process_memory_resident FROM resource WHERE run_id=:run_id"""),
+        params={'run_id': workflow_id},
+        float32_columns=['psutil_process_time_user', 'psutil_process_time_system', 'psutil_process_memory_resident'])
+    if df_resources.empty:
+        return None
+
+    df_task = df_task_future.result()
+    df_task_tries = df_task_tries_future.result()
+    df_node = df_node_future.result()
+
+    return dict(user_time_distribution_avg_plot=resource_distribution_plot(
+                    df_resources, df_task, type='psutil_process_time_user', label='CPU Time Distribution', option='avg'),
+                user_time_distribution_max_plot=resource_distribution_plot(
+                    df_resources, df_task, type='psutil_process_time_user', label='CPU Time Distribution', option='max'),
+                memory_usage_distribution_avg_plot=resource_distribution_plot(
+                    df_resources, df_task, type='psutil_process_memory_resident', label='Memory Distribution', option='avg'),
+                memory_usage_distribution_max_plot=resource_distribution_plot(
+                    df_resources, df_task, type='psutil_process_memory_resident', label='Memory Distribution', option='max'),
+                cpu_efficiency=resource_efficiency(df_resources, df_node, label='CPU'),
+                memory_efficiency=resource_efficiency(df_resources, df_node, label='mem'),
+                worker_efficiency=worker_efficiency(df_task_tries, df_node),
+                )
@@ -0,0 +1,68 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from parsl.dataflow import flow_control
+from parsl.dataflow.flow_control import FlowControl
+
+
+@pytest.mark.local
+def test_notify_wakes_callback_before_interval():
+    config = SimpleNamespace(executors=[], strategy=None, max_idletime=120)
+    fc = FlowControl(SimpleNamespace(config=config), threshold=2, interval=3600)
+
+    calls = []
+    called = threading.Event()
+
+    def callback(tasks, kind):
+        if kind == 'event':
+            calls.append(tasks)
+            called.set()
+
+    fc.callback = callback
+    try:
+        fc.notify(1)
+        fc.notify(2)
+        assert called.wait(10), "notify() crossing the threshold did not wake the callback"
+        assert calls == [[1, 2]]
+    finally:
+        fc.close()
+
+
+class CountingEvent(threading.Event):
+    """An Event which counts the waits that it ends by being set."""
+
+    def __init__(self):
+        super().__init__()
+        self.wake_ups = 0
+
+    def wait(self, timeout=None):
+        woken = super().wait(timeout)
+        if woken:
+            self.wake_ups += 1
+        return woken
+
+
+@pytest.mark.local
+def test_notify_burst_makes_bounded_callbacks(monkeypatch):
+    monkeypatch.setattr(flow_control, 'threading',
+                        SimpleNamespace(Event=CountingEvent, Thread=threading.Thread))
+    config = SimpleNamespace(executors=[], strategy=None, max_idletime=120)
+    fc = FlowControl(SimpleNamespace(config=config), threshold=1, interval=5)
+
+    calls = []
+    fc.callback = lambda tasks, kind: calls.append(kind)
+    try:
+        end = time.time() + 2
+        while time.time() < end:
+            fc.notify(1)
+            time.sleep(0.001)
+    finally:
+        fc.close()
+
+    # callbacks are spaced at least interval / 5 = 1s apart, and the events
+    # between them do not wake the flow control thread
+    assert 1 <= len(calls) <= 4
+    assert fc._wake_up_event.wake_ups <= len(calls) + 1
@@ -0,0 +1,227 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from parsl.dataflow.strategy import Strategy, _decide, _NOOP, _SCALE_IN, _SCALE_IN_IDLE, _SCALE_OUT
+from parsl.executors import HighThroughputExecutor
+from parsl.providers import LocalProvider
+from parsl.providers.provider_base import JobState, JobStatus
+
+
+class FakeExecutorStatus(object):
+    """Records scaling requests made by the strategy instead of acting on them."""
+
+    def __init__(self, executor, states):
+        self.executor = executor
+        self.status = {str(i): JobStatus(s) for i, s in enumerate(states)}
+        self.scaled_out = []
+        self.scaled_in = []
+
+    def scale_out(self, n):
+        self.scaled_out.append(n)
+
+    def scale_in(self, n, force=True, max_idletime=None):
+        self.scaled_in.append(n)
+        for block_id in list(self.status)[:n]:
+            del self.status[block_id]
+
+
+def make_executor(label='fake', outstanding=0, min_blocks=0, max_blocks=10,
+                  nodes_per_block=1, parallelism=1, workers_per_node=1):
+    provider = SimpleNamespace(min_blocks=min_blocks, max_blocks=max_blocks,
+                               nodes_per_block=nodes_per_block, parallelism=parallelism)
+    return SimpleNamespace(label=label, scaling_enabled=True, status_polling_interval=5,
+                           outstanding=outstanding, provider=provider, workers_per_node=workers_per_node,
+                           status_description=lambda *args: "Fake executor {}".format(label))
+
+
+def make_strategy(executors, strategy='simple', max_idletime=120):
+    config = SimpleNamespace(executors=executors, strategy=strategy, max_idletime=max_idletime)
+    strategy = Strategy(SimpleNamespace(config=config))
+    strategy.add_executors(executors)
+    return strategy
+
+
+@pytest.mark.local
+def test_scale_out_counts_only_live_blocks():
+    executor = make_executor(outstanding=5, workers_per_node=2)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING, JobState.PENDING,
+                                                JobState.COMPLETED, JobState.FAILED])
+    strategy = make_strategy([executor])
+
+    strategy.strategize([exec_status], None)
+
+    # 2 live blocks provide 4 slots for 5 tasks, so one more block is needed
+    assert exec_status.scaled_out == [1]
+    assert exec_status.scaled_in == []
+
+
+@pytest.mark.local
+def test_scale_out_respects_max_blocks():
+    executor = make_executor(outstanding=100, max_blocks=3)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING])
+    strategy = make_strategy([executor])
+
+    strategy.strategize([exec_status], None)
+
+    assert exec_status.scaled_out == [2]
+
+
+@pytest.mark.local
+def test_idle_scale_in_after_max_idletime():
+    executor = make_executor(outstanding=0, min_blocks=1)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING] * 3)
+    strategy = make_strategy([executor], max_idletime=0)
+
+    # the first pass starts the kill timer, which may expire on either pass
+    strategy.strategize([exec_status], None)
+    strategy.strategize([exec_status], None)
+
+    assert exec_status.scaled_in == [2]
+    assert exec_status.scaled_out == []
+
+
+@pytest.mark.local
+def test_unchanged_status_still_retries_scale_out():
+    # the fake never adds the requested blocks, as if the provider failed to submit
+    executor = make_executor(outstanding=1)
+    exec_status = FakeExecutorStatus(executor, [])
+    strategy = make_strategy([executor])
+
+    strategy.strategize([exec_status], None)
+    strategy.strategize([exec_status], None)
+
+    assert exec_status.scaled_out == [1, 1]
+
+
+@pytest.mark.local
+def test_unchanged_status_after_no_op_is_skipped():
+    executor = make_executor(outstanding=1)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING])
+    strategy = make_strategy([executor])
+
+    strategy.strategize([exec_status], None)
+    assert strategy._last_fingerprint == {'fake': (1, 1, 0)}
+
+    executor.outstanding = 2
+    strategy.strategize([exec_status], None)
+    assert exec_status.scaled_out == [1]
+
+
+@pytest.mark.local
+def test_scaling_failure_does_not_block_other_executors(caplog):
+    failing = make_executor(label='failing', outstanding=1)
+    working = make_executor(label='working', outstanding=1)
+    failing_status = FakeExecutorStatus(failing, [])
+    working_status = FakeExecutorStatus(working, [])
+
+    def broken_scale_out(n):
+        raise RuntimeError("provider unavailable")
+    failing_status.scale_out = broken_scale_out
+
+    strategy = make_strategy([failing, working])
+    strategy.strategize([failing_status, working_status], None)
+
+    assert working_status.scaled_out == [1]
+    assert "Failed to broken_scale_out 1 blocks of executor failing" in caplog.text
+
+
+@pytest.mark.local
+def test_status_description_only_built_for_debug_logging(caplog):
+    executor = make_executor(outstanding=1)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING])
+
+    caplog.set_level(logging.INFO, logger='parsl.dataflow.strategy')
+    executor.status_description = None  # would fail if called
+    make_strategy([executor]).strategize([exec_status], None)
+
+    caplog.set_level(logging.DEBUG, logger='parsl.dataflow.strategy')
+    executor.status_description = lambda *args: "Fake executor with {}/{}/{}".format(*args)
+    make_strategy([executor]).strategize([exec_status], None)
+    assert "Fake executor with 1/1/0" in caplog.text
+
+
+@pytest.mark.local
+@pytest.mark.parametrize("outstanding, parallelism, workers_per_node, expected", [
+    (5, 1, 3, [1]),         # 2 missing slots fit in one more block
+    (10, 1, 3, [3]),        # 7 missing slots need 3 more blocks
+    (20, 1, 3, [3]),        # 17 missing slots need 6 more blocks, capped by max_blocks
+    (7, 0.5, 2, [1]),       # 3.5 slots wanted for 2 present
+    (4, 0.5, 2, []),        # exactly the wanted number of slots
+    (9, 1, 2.0, [3]),       # a float workers_per_node still requests whole blocks
+])
+def test_scale_out_block_count(outstanding, parallelism, workers_per_node, expected):
+    executor = make_executor(outstanding=outstanding, max_blocks=4, parallelism=parallelism,
+                             workers_per_node=workers_per_node)
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING])
+    make_strategy([executor]).strategize([exec_status], None)
+
+    assert exec_status.scaled_out == expected
+    assert all(type(n) is int for n in exec_status.scaled_out)
+
+
+@pytest.mark.local
+@pytest.mark.parametrize("strategy_name, expected", [(None, []), ('simple', [1]), ('htex_auto_scale', [1])])
+def test_strategy_option_selects_strategy(strategy_name, expected):
+    executor = make_executor(outstanding=1)
+    exec_status = FakeExecutorStatus(executor, [])
+    make_strategy([executor], strategy=strategy_name).strategize([exec_status], None)
+
+    assert exec_status.scaled_out == expected
+
+
+class UnstartedHTEX(HighThroughputExecutor):
+    """An HTEX which is never started, with a settable task count."""
+
+    scaling_enabled = True
+    outstanding = 0
+
+
+@pytest.mark.local
+@pytest.mark.parametrize("strategy_name, expected", [('simple', []), ('htex_auto_scale', [2])])
+def test_htex_underused_blocks_scale_in(strategy_name, expected):
+    executor = UnstartedHTEX(label='htex', max_workers=1, provider=LocalProvider(max_blocks=3))
+    executor.outstanding = 1
+    exec_status = FakeExecutorStatus(executor, [JobState.RUNNING] * 3)
+    make_strategy([executor], strategy=strategy_name).strategize([exec_status], None)
+
+    assert exec_status.scaled_in == expected
+
+
+@pytest.mark.local
+def test_executors_without_scaling_are_ignored():
+    executor = make_executor(outstanding=1)
+    executor.scaling_enabled = False
+    exec_status = FakeExecutorStatus(executor, [])
+    strategy = make_strategy([executor])
+    assert not strategy._scaling_labels
+
+    strategy.strategize([exec_status], None)
+    assert exec_status.scaled_out == []
+
+
+@pytest.mark.local
+def test_unpolled_executors_without_provider_are_ignored():
+    # like the FluxExecutor: scaling_enabled is a method, so it is always true,
+    # but the executor is never polled and has no provider or workers_per_node
+    executor = SimpleNamespace(label='flux', scaling_enabled=lambda: False,
+                               status_polling_interval=-1, outstanding=1)
+    strategy = make_strategy([executor])
+
+    assert not strategy._scaling_labels
+
+
+@pytest.mark.local
+@pytest.mark.parametrize("active_tasks, active_blocks, htex_scale_in, expected", [
+    (0, 1, False, (_NOOP, 0)),          # no tasks, min_blocks already
+    (0, 3, False, (_SCALE_IN_IDLE, 2)),  # no tasks, idle blocks above min_blocks
+    (9, 1, False, (_SCALE_OUT, 3)),     # 7 missing slots need 4 blocks, capped by max_blocks
+    (9, 4, False, (_NOOP, 0)),          # max_blocks already
+    (4, 2, False, (_NOOP, 0)),          # tasks fit the slots
+    (1, 3, False, (_NOOP, 0)),          # underused blocks are kept without htex scale in
+    (1, 3, True, (_SCALE_IN, 2)),       # 5 excess slots, but min_blocks is kept
+])
+def test_decide(active_tasks, active_blocks, htex_scale_in, expected):
+    assert _decide(active_tasks, active_blocks, min_blocks=1, max_blocks=4, parallelism=1,
+                   slots_per_block=2, htex_scale_in=htex_scale_in) == expected